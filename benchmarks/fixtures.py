@@ -0,0 +1,227 @@
+"""Synthetic fixtures for the benchmarks: course trees, fuzzy JSON manifests and a local HTTP server.
+
+Everything is generated from a seed so that two runs measure the same work.
+"""
+import os
+import json
+import random
+import zipfile
+import threading
+from pathlib import Path
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+TOPICS = ["Introduction", "Installing", "Configuring", "Understanding", "Working with", "Deep dive into",
+          "Managing", "Debugging", "Securing", "Automating", "Scaling", "Monitoring", "Testing", "Deploying"]
+SUBJECTS = ["the Linux shell", "file permissions", "processes & signals", "pipes and redirections",
+            "SSH keys", "systemd units", "cron jobs", "the network stack", "Docker images", "Kubernetes pods",
+            "Python virtualenvs", "git branches", "regular expressions", "bash scripting basics",
+            "advanced bash scripting", "log rotation", "disk partitions", "users, groups & sudo"]
+
+
+def course_name(rng, index):
+    """Return a realistic lecture name such as '7. Managing cron jobs'."""
+    return f"{index}. {rng.choice(TOPICS)} {rng.choice(SUBJECTS)}"
+
+
+def make_tree(root, n_files, files_per_chapter=50, seed=0, file_size=0):
+    """Create a course tree ``root/learn/<k>. <chapter>/<i>. <lecture>.mp4``, unpadded like freshly downloaded courses.
+
+    Args:
+        root (Path): The directory to create the tree in.
+        n_files (int): The total number of files.
+        files_per_chapter (int): The number of files in each chapter folder.
+        seed (int): The seed of the name generator.
+        file_size (int): The size of each file. The files are sparse, so big sizes cost no disk space.
+
+    Returns:
+        Path: The course folder (``root/learn``).
+    """
+    rng = random.Random(seed)
+    course = Path(root, "learn")
+    n_chapters = max(1, -(-n_files // files_per_chapter))
+    created = 0
+    for chapter_index in range(1, n_chapters + 1):
+        chapter = course / course_name(rng, chapter_index)
+        chapter.mkdir(parents=True, exist_ok=True)
+        for file_index in range(1, min(files_per_chapter, n_files - created) + 1):
+            with open(chapter / f"{course_name(rng, file_index)}.mp4", "wb") as f:
+                if file_size:
+                    f.truncate(file_size)
+            created += 1
+    return course
+
+
+def make_flat_folder(root, n_files, seed=0):
+    """Create a folder of ``n_files`` lectures and a manifest grouping them, as expected by ``group_files``.
+
+    The manifest names are noisy copies of the real names (case, spacing, missing prefix, typos)
+    so that ``get_actual_file_name`` has to fuzzy match them. Each noisy name keeps a single best match:
+    repeated lectures get a ", part k" suffix, and only lectures whose name is unique without the prefix
+    lose it in the manifest.
+
+    Args:
+        root (Path): The directory to create the folder in.
+        n_files (int): The number of lectures.
+        seed (int): The seed of the name generator.
+
+    Returns:
+        tuple: (folder path, manifest path, list of the real file names)
+    """
+    rng = random.Random(seed)
+    folder = Path(root, "flat")
+    folder.mkdir(parents=True, exist_ok=True)
+    names, manifest, seen = [], {}, {}
+    for index in range(1, n_files + 1):
+        name = course_name(rng, index)
+        base = name.split(". ", 1)[1]
+        seen[base] = seen.get(base, 0) + 1
+        if seen[base] > 1:
+            name = f"{name}, part {seen[base]}"
+        name = f"{name}.mp4"
+        (folder / name).touch()
+        names.append(name)
+        chapter = f"Chapter {index // 50 + 1:03d}"
+        manifest.setdefault(chapter, {})[str(index)] = noisy_name(rng, name, keep_prefix=seen[base] > 1)
+    manifest_path = Path(root, "manifest.json")
+    manifest_path.write_text(json.dumps(manifest, indent=1))
+    return folder, manifest_path, names
+
+
+def noisy_name(rng, name, keep_prefix=False):
+    """Return a copy of a file name with the kind of differences found in course manifests.
+
+    Args:
+        rng (random.Random): The random generator.
+        name (str): The real file name.
+        keep_prefix (bool): Never drop the numeric prefix (for names that are not unique without it).
+    """
+    stem = name[:-len(".mp4")]
+    variant = rng.randrange(4)
+    while keep_prefix and variant == 1:
+        variant = rng.randrange(4)
+    if variant == 0:
+        stem = stem.lower()
+    elif variant == 1:
+        stem = stem.split(". ", 1)[-1]
+    elif variant == 2:
+        stem = stem.replace(" ", "  ", 1)
+    else:
+        # the typo is kept away from the ", part k" suffix which tells repeated lectures apart
+        position = rng.randrange(len(stem.split(", part ")[0]) // 2 + 1)
+        stem = stem[:position] + stem[position + 1:]
+    return stem + ".mp4"
+
+
+def make_sparse_file(path, size):
+    """Create a sparse file of ``size`` bytes (no disk space is used on filesystems supporting it)."""
+    with open(path, "wb") as f:
+        f.truncate(size)
+    return Path(path)
+
+
+def make_zip_archive(path, size, members=8, chunk_size=1024 * 1024):
+    """Create a zip archive of about ``size`` bytes holding ``members`` stored (uncompressed) files.
+
+    Args:
+        path (Path): The path of the archive.
+        size (int): The total size of the members.
+        members (int): The number of members.
+        chunk_size (int): The size of the blocks written.
+
+    Returns:
+        Path: The path of the archive.
+    """
+    member_size = -(-size // members)
+    chunk = b"\0" * chunk_size
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive:
+        for index in range(members):
+            with archive.open(f"part-{index:03d}.bin", "w", force_zip64=True) as member:
+                for offset in range(0, member_size, chunk_size):
+                    member.write(chunk[:min(chunk_size, member_size - offset)])
+    return Path(path)
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler answering ``Range: bytes=start-end`` requests with 206 partial content."""
+
+    # the default 8 KiB copy buffer would make python the bottleneck
+    buffer_size = 1024 * 1024
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        range_header = self.headers.get("Range")
+        if not range_header or os.path.isdir(path):
+            return super().send_head()
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        size = os.fstat(f.fileno()).st_size
+        start, _, end = range_header.strip().removeprefix("bytes=").partition("-")
+        start = int(start) if start else 0
+        end = min(int(end), size - 1) if end else size - 1
+        if start > end:
+            f.close()
+            self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            return None
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        f.seek(start)
+        self._remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "_remaining", None)
+        while remaining is None or remaining > 0:
+            chunk = source.read(self.buffer_size if remaining is None else min(self.buffer_size, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+
+
+class LocalServer:
+    """Range capable HTTP server serving a directory from a background thread.
+
+    The served directory gets an ``index.html`` listing its files with the ``title="Download file"``
+    links that ``download_repos.get_direct_download_links`` looks for.
+
+    Example:
+        with LocalServer(directory) as server:
+            url = server.url("big.bin")
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        links = "\n".join(f'<a title="Download file" href="/{name}">{name}</a>'
+                          for name in sorted(os.listdir(self.directory)))
+        Path(self.directory, "index.html").write_text(f"<html><body>{links}</body></html>")
+        handler = lambda *args, **kwargs: RangeRequestHandler(*args, directory=self.directory, **kwargs)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def domain(self):
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def url(self, name=""):
+        return f"http://{self.domain}/{name}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,374 @@
+"""Benchmarks of the hot paths of the scripts on synthetic fixtures.
+
+Each benchmark runs in a fresh process so that its peak RSS is its own. The results (seconds, throughput,
+peak RSS) are printed, and compared with a stored baseline: a benchmark slower or bigger than the baseline
+by more than ``--tolerance`` is reported as a regression and the exit code is 1. A benchmark raising an
+error also fails the run, and the baseline is then not saved.
+
+    python benchmarks/run_benchmarks.py                         # run and compare with benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline         # run and store the results as the new baseline
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --only rename catalogue
+
+Benchmarks:
+    match          get_actual_file_name: 200 fuzzy lookups against n candidate names
+    group          group_files.process_files on a flat folder of n files (quadratic: capped by --max-quadratic)
+    rename         rename_folders.rename_subfolders on a tree of n files, listing the disk
+    rename_cat     the same, listing a warm catalogue
+    catalogue      Catalogue.refresh of a tree of n files, cold (first index) and warm (nothing changed)
+    playlist       make_playlist.write_playlist on a tree of n files, listing the disk and a warm catalogue
+    links          download_repos.get_direct_download_links on a local page listing n files
+    download       --download-archives zip archives (--download-size bytes in total) fetched from the local HTTP
+                   server with parallel range requests, each handed to extract_archives.ExtractionPipeline as
+                   soon as it is complete, like download_repos.main: the time to an extracted tree
+                   (download_with_idm drives IDM on Windows and cannot run here: the ranges stand in for it)
+    imports        import time of the modules used by worker processes, checked against IMPORT_BUDGETS
+                   (a budget exceeded, or a heavy dependency imported, is a regression even without baseline)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import concurrent.futures
+import multiprocessing
+import urllib.request
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+import fixtures
+
+DEFAULT_BASELINE = BENCHMARKS_DIR / "baseline.json"
+MATCH_QUERIES = 200
+
+# modules imported by worker processes: import time budget in seconds, and heavy modules they must not load
+IMPORT_BUDGETS = {
+    "download_repos": 0.05,
+    "make_playlist": 0.05,
+}
+HEAVY_MODULES = ("requests", "bs4", "fuzzywuzzy", "tqdm", "sqlite3")
+IMPORT_REPEATS = 5
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of the current process in MB, or None if it cannot be measured."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(peak / 1024 ** (2 if sys.platform == "darwin" else 1), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / 1024 ** 2, 1)
+    except ImportError:
+        return None
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    """Silence the prints of the scripts while they are timed."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def bench_match(tmp, n, args):
+    from group_files import get_actual_file_name
+    _, manifest_path, names = fixtures.make_flat_folder(tmp, n)
+    manifest = json.loads(manifest_path.read_text())
+    queries = [name for files in manifest.values() for name in files.values()][:MATCH_QUERIES]
+    start = time.perf_counter()
+    for query in queries:
+        get_actual_file_name(query, names)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "throughput": len(queries) * len(names) / seconds, "unit": "comparisons/s"}
+
+
+def bench_group(tmp, n, args):
+    from group_files import process_files
+    n = min(n, args.max_quadratic)
+    folder, manifest_path, names = fixtures.make_flat_folder(tmp, n)
+    start = time.perf_counter()
+    with quiet_stdout():
+        process_files(folder, manifest_path)
+    seconds = time.perf_counter() - start
+    # a wrong match moves a file to the wrong subfolder: a fast but wrong run must not pass
+    manifest = json.loads(manifest_path.read_text())
+    misplaced = [names[int(index) - 1] for chapter, files in manifest.items() for index in files
+                 if not (folder / chapter / names[int(index) - 1]).is_file()]
+    assert not misplaced, f"{len(misplaced)} files not in their manifest subfolder, e.g. {misplaced[0]}"
+    return {"seconds": seconds, "throughput": n / seconds, "unit": "files/s", "files": n}
+
+
+def check_renamed(course, n):
+    """Assert that the ``n`` files of a course tree are all there and every prefix is zero padded."""
+    from rename_folders import split_name
+    count = 0
+    for directory, subdirs, files in os.walk(course):
+        count += len(files)
+        for names in (subdirs, files):
+            if not names:
+                continue
+            width = len(str(max(split_name(name)[0] for name in names)))
+            unpadded = [name for name in names if len(name.split(".", 1)[0]) != width]
+            assert not unpadded, f"not renamed in {directory}: {unpadded[:3]}"
+    assert count == n, f"expected {n} files, found {count}"
+
+
+def bench_rename(tmp, n, args):
+    from rename_folders import rename_subfolders
+    fixtures.make_tree(tmp, n)
+    start = time.perf_counter()
+    with quiet_stdout():
+        rename_subfolders(tmp, "learn")
+    seconds = time.perf_counter() - start
+    check_renamed(Path(tmp, "learn"), n)
+    return {"seconds": seconds, "throughput": n / seconds, "unit": "files/s"}
+
+
+def bench_rename_cat(tmp, n, args):
+    from catalogue import Catalogue
+    from rename_folders import rename_subfolders
+    fixtures.make_tree(tmp, n)
+    catalogue = Catalogue(Path(tmp, "catalogue.sqlite"), probe_durations=False)
+    catalogue.refresh(tmp)
+    start = time.perf_counter()
+    with quiet_stdout():
+        rename_subfolders(tmp, "learn", catalogue)
+    seconds = time.perf_counter() - start
+    check_renamed(Path(tmp, "learn"), n)
+    # the catalogue must have followed the renames without a rescan
+    course = Path(tmp, "learn")
+    listed = sorted(str(path) for chapter in catalogue.list_dirs(course) for path in catalogue.list_files(chapter))
+    on_disk = sorted(str(path) for path in course.glob("*/*"))
+    assert listed == on_disk, "the catalogue does not match the renamed tree"
+    return {"seconds": seconds, "throughput": n / seconds, "unit": "files/s"}
+
+
+def bench_catalogue(tmp, n, args):
+    from catalogue import Catalogue
+    fixtures.make_tree(tmp, n)
+    catalogue = Catalogue(Path(tmp, "catalogue.sqlite"), probe_durations=False)
+    start = time.perf_counter()
+    catalogue.refresh(tmp)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    catalogue.refresh(tmp)
+    warm = time.perf_counter() - start
+    return {"seconds": cold + warm, "cold_seconds": cold, "warm_seconds": warm,
+            "throughput": n / cold, "unit": "files/s (cold)"}
+
+
+def bench_playlist(tmp, n, args):
+    from catalogue import Catalogue
+    from make_playlist import write_playlist
+    course = fixtures.make_tree(tmp, n)
+    start = time.perf_counter()
+    write_playlist(str(course), str(Path(tmp, "disk.xspf")))
+    disk = time.perf_counter() - start
+    catalogue = Catalogue(Path(tmp, "catalogue.sqlite"), probe_durations=False)
+    catalogue.refresh(course)
+    start = time.perf_counter()
+    write_playlist(str(course), str(Path(tmp, "catalogue.xspf")), catalogue)
+    catalogued = time.perf_counter() - start
+    return {"seconds": disk + catalogued, "disk_seconds": disk, "catalogue_seconds": catalogued,
+            "throughput": n / disk, "unit": "files/s (disk)"}
+
+
+def bench_links(tmp, n, args):
+    import download_repos
+    served = Path(tmp, "served")
+    served.mkdir()
+    for index in range(n):
+        (served / f"model-{index:06d}.safetensors").touch()
+    with fixtures.LocalServer(served) as server, quiet_stdout():
+        start = time.perf_counter()
+        links = download_repos.get_direct_download_links(server.url("index.html"), server.domain)
+        seconds = time.perf_counter() - start
+    assert len(links) == n, f"expected {n} links, got {len(links)}"
+    return {"seconds": seconds, "throughput": n / seconds, "unit": "links/s"}
+
+
+def _fetch_range(url, path, start, end, chunk_size=1024 * 1024):
+    """Download the bytes ``start``-``end`` of ``url`` into the same bytes of the file ``path``."""
+    request = urllib.request.Request(url, headers={"Range": f"bytes={start}-{end}"})
+    received = 0
+    with urllib.request.urlopen(request) as response, open(path, "r+b") as f:
+        f.seek(start)
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                break
+            f.write(chunk)
+            received += len(chunk)
+    return received
+
+
+def bench_download(tmp, n, args):
+    from extract_archives import ExtractionPipeline
+    served, downloads = Path(tmp, "served"), Path(tmp, "downloads")
+    served.mkdir()
+    downloads.mkdir()
+    archive_size = -(-args.download_size // args.download_archives)
+    for index in range(args.download_archives):
+        fixtures.make_zip_archive(served / f"shard-{index:02d}.zip", archive_size)
+    names = sorted(path.name for path in served.glob("*.zip"))
+    download_seconds = 0.0
+    with fixtures.LocalServer(served) as server, \
+            concurrent.futures.ThreadPoolExecutor(args.download_parts) as pool:
+        start = time.perf_counter()
+        with ExtractionPipeline(workers=2) as pipeline:
+            for name in names:
+                size = (served / name).stat().st_size
+                path = downloads / name
+                with open(path, "wb") as f:
+                    f.truncate(size)
+                part = -(-size // args.download_parts)
+                ranges = [(start_byte, min(start_byte + part, size) - 1) for start_byte in range(0, size, part)]
+                fetch_start = time.perf_counter()
+                received = sum(pool.map(lambda bounds: _fetch_range(server.url(name), path, *bounds), ranges))
+                download_seconds += time.perf_counter() - fetch_start
+                assert received == size, f"{name}: expected {size} bytes, got {received}"
+                # extracted in the background while the next archive downloads
+                pipeline.submit(path)
+        failures = pipeline.failures
+        seconds = time.perf_counter() - start
+    assert not failures, f"extraction failed: {failures}"
+    extracted = sum(file.stat().st_size for name in names for file in (downloads / name).with_suffix("").iterdir())
+    assert extracted >= args.download_size, f"expected {args.download_size} extracted bytes, got {extracted}"
+    return {"seconds": seconds, "download_seconds": download_seconds,
+            "throughput": args.download_size / seconds / 1024 ** 2, "unit": "MiB/s extracted"}
+
+
+def bench_imports(tmp, n, args):
+    """Import each module of IMPORT_BUDGETS in fresh interpreters; the best of IMPORT_REPEATS runs is kept."""
+    probe = ("import sys, time; start = time.perf_counter(); import {module}; "
+             "elapsed = time.perf_counter() - start; "
+             "print(elapsed, [m for m in {heavy!r} if m in sys.modules])")
+    result = {"seconds": 0.0, "over_budget": []}
+    for module, budget in IMPORT_BUDGETS.items():
+        runs = []
+        for _ in range(IMPORT_REPEATS):
+            output = subprocess.run([sys.executable, "-c", probe.format(module=module, heavy=HEAVY_MODULES)],
+                                    cwd=BENCHMARKS_DIR.parent, capture_output=True, text=True, check=True,
+                                    stdin=subprocess.DEVNULL, timeout=60).stdout
+            elapsed, loaded = output.split(" ", 1)
+            runs.append(float(elapsed))
+        best = min(runs)
+        result[f"{module}_seconds"] = best
+        result["seconds"] += best
+        if loaded.strip() != "[]":
+            result["over_budget"].append(f"{module} imports {loaded.strip()}")
+        if best > budget:
+            result["over_budget"].append(f"{module} takes {best * 1000:.1f} ms, budget {budget * 1000:.0f} ms")
+    result.update(throughput=len(IMPORT_BUDGETS) / result["seconds"], unit="imports/s")
+    return result
+
+
+BENCHMARKS = {
+    "match": (bench_match, True),
+    "group": (bench_group, True),
+    "rename": (bench_rename, True),
+    "rename_cat": (bench_rename_cat, True),
+    "catalogue": (bench_catalogue, True),
+    "playlist": (bench_playlist, True),
+    "links": (bench_links, True),
+    # the download does not depend on the number of files
+    "download": (bench_download, False),
+    "imports": (bench_imports, False),
+}
+
+
+def run_one(name, n, args):
+    """Run one benchmark in the current process (called in a fresh worker process)."""
+    function, _ = BENCHMARKS[name]
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as tmp:
+        result = function(Path(tmp), n, args)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_isolated(name, n, args):
+    """Run one benchmark in a fresh process and return its result, or the error it raised."""
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+        try:
+            return executor.submit(run_one, name, n, args).result()
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+
+def compare(results, baseline, tolerance):
+    """Return the list of regressions of ``results`` compared to ``baseline`` and to the import budgets."""
+    regressions = [f"{key}: {problem}" for key, result in results.items() for problem in result.get("over_budget", [])]
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if not reference or "error" in result or "error" in reference:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if result.get(metric) and reference.get(metric) and result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {reference[metric]:.3f} -> {result[metric]:.3f} "
+                                   f"(+{100 * (result[metric] / reference[metric] - 1):.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="numbers of files")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--max-quadratic", type=int, default=2000,
+                        help="cap of the number of files of the quadratic 'group' benchmark")
+    parser.add_argument("--download-size", type=int, default=512 * 1024 ** 2,
+                        help="total size in bytes of the downloaded archives")
+    parser.add_argument("--download-archives", type=int, default=4, help="number of downloaded archives")
+    parser.add_argument("--download-parts", type=int, default=8, help="number of parallel range requests")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a regression")
+    parser.add_argument("--output", type=Path, help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        _, sized = BENCHMARKS[name]
+        for n in (args.sizes if sized else [max(args.sizes)]):
+            key = f"{name}[{n}]" if sized else name
+            result = run_isolated(name, n, args)
+            results[key] = result
+            if "error" in result:
+                print(f"{key:<22} ERROR {result['error']}")
+            else:
+                print(f"{key:<22} {result['seconds']:>9.3f} s {result['throughput']:>14,.0f} {result['unit']:<16}"
+                      f" peak RSS {result['peak_rss_mb']} MB")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    errors = [key for key, result in results.items() if "error" in result]
+    if errors:
+        # a failed benchmark is a failure of the run, and must never become the reference
+        print(f"FAILED {', '.join(errors)}{' (baseline not saved)' if args.save_baseline else ''}")
+        return 1
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    else:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create it")
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+"""SQLite catalogue of the media library shared by group_files, rename_folders and make_playlist.
+
+The library is indexed once: for every file the catalogue stores its path, size, mtime, numeric prefix
+(see ``rename_folders.split_name``), media duration and group (the name of the folder holding it). ``refresh`` only stats the directories: a directory whose mtime did not change
+since the last scan keeps its rows, so a refresh of an unchanged library is one ``stat`` per directory
+instead of one per file. The tools then query the catalogue instead of listing the disk.
+
+A file rewritten in place does not change the mtime of its directory; use ``refresh(root, full=True)``
+to rescan everything.
+
+The durations are not read by ``refresh``: ffprobe is one process per file, which would make the first
+index of a big library much slower than listing it. The tools needing them call ``fill_durations``,
+which probes only the files without a duration yet, on a thread pool (when ``ffprobe`` is installed).
+
+Example:
+    catalogue = Catalogue()
+    catalogue.refresh("D:/online_learning")
+    videos = catalogue.list_files("D:/online_learning/linux", suffixes=(".mp4",))
+"""
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import subprocess
+import concurrent.futures
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_DB_PATH = Path(os.getenv("MEDIA_CATALOGUE", Path.home() / ".media_catalogue.sqlite"))
+
+MEDIA_SUFFIXES = (".mp4", ".mkv", ".avi", ".mov", ".webm", ".m4v", ".mp3", ".m4a", ".wav", ".flac")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    name TEXT NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    prefix INTEGER,
+    duration REAL,
+    grp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+"""
+
+
+def _key(path):
+    """Normalize a path into the key used in the tables (absolute, no IO)."""
+    return os.path.normcase(os.path.abspath(str(path)))
+
+
+def parse_prefix(name):
+    """Return the numeric prefix of a file or directory name, or None if it does not follow the pattern.
+
+    Args:
+        name (str): The name of the file or directory.
+
+    Returns:
+        int: The prefix, e.g. 3 for "03. Pipes and redirections.mp4".
+    """
+    # imported here because rename_folders itself imports this module
+    from rename_folders import split_name
+    try:
+        return split_name(name)[0]
+    except (AssertionError, AttributeError):
+        return None
+
+
+def probe_duration(path):
+    """Return the duration of a media file in seconds using ffprobe, or None if it is not available.
+
+    Args:
+        path (str): The path of the media file.
+
+    Returns:
+        float: The duration in seconds.
+    """
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe or not str(path).lower().endswith(MEDIA_SUFFIXES):
+        return None
+    command = [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "json", str(path)]
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, timeout=60, check=True).stdout
+        return float(json.loads(output)["format"]["duration"])
+    except (subprocess.SubprocessError, OSError, KeyError, ValueError):
+        return None
+
+
+class Catalogue:
+    """Index of a media library stored in SQLite.
+
+    Args:
+        db_path (str): The path of the SQLite database. Defaults to $MEDIA_CATALOGUE or ~/.media_catalogue.sqlite.
+        probe_durations (bool): Whether ``refresh`` also reads the missing durations (see ``fill_durations``).
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, probe_durations=False):
+        self.db_path = str(db_path)
+        self.probe_durations = probe_durations
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.row_factory = sqlite3.Row
+        # without WAL every commit waits for a disk sync
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(_SCHEMA)
+        # > 0 while inside batch(): record_move then leaves the commit to the end of the batch
+        self._batch_depth = 0
+
+    @contextmanager
+    def batch(self):
+        """Record the moves of a whole rename/group pass in a single transaction.
+
+        Example:
+            with catalogue.batch():
+                for source, destination in moves:
+                    shutil.move(source, destination)
+                    catalogue.record_move(source, destination)
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                # committed even on error: the moves recorded so far did happen on disk
+                self.connection.commit()
+
+    def refresh(self, root, full=False):
+        """Bring the entries below ``root`` up to date with the disk.
+
+        Args:
+            root (str): The directory to index.
+            full (bool): Rescan every directory, even those whose mtime did not change.
+
+        Returns:
+            int: The number of directories that were rescanned.
+        """
+        rescanned = 0
+        # (key, real path): the keys are normcased (lowercased on Windows), the names come from the real paths
+        stack = [(_key(root), os.path.abspath(str(root)))]
+        with self.batch():
+            while stack:
+                directory, real_path = stack.pop()
+                try:
+                    mtime = os.stat(real_path).st_mtime
+                except FileNotFoundError:
+                    self._forget_dir(directory)
+                    continue
+                except OSError as e:
+                    print(f"Skipped {real_path}: {e}")
+                    continue
+                row = self.connection.execute("SELECT mtime FROM dirs WHERE path = ?", (directory,)).fetchone()
+                if row is not None and row["mtime"] == mtime and not full:
+                    stack.extend(self._child_dirs(directory, real_path))
+                    continue
+                try:
+                    listing = self._list_dir(real_path)
+                except OSError as e:
+                    # e.g. "System Volume Information" or "$RECYCLE.BIN" at the root of a Windows drive
+                    print(f"Skipped {real_path}: {e}")
+                    continue
+                stack.extend(self._scan_dir(directory, real_path, mtime, listing))
+                rescanned += 1
+        if self.probe_durations:
+            self.fill_durations(root)
+        return rescanned
+
+    def _child_dirs(self, directory, real_path):
+        rows = self.connection.execute("SELECT path, name FROM dirs WHERE parent = ?", (directory,))
+        return [(row["path"], os.path.join(real_path, row["name"])) for row in rows]
+
+    @staticmethod
+    def _list_dir(real_path):
+        """Return the subdirectories and the files (with their stat) of a directory.
+
+        Returns:
+            tuple: ({name: path} of the subdirectories, [(entry, stat)] of the files)
+        """
+        subdirs, files = {}, []
+        with os.scandir(real_path) as entries:
+            for entry in entries:
+                # symlinks to directories are not followed: a link to a parent would loop forever
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs[entry.name] = entry.path
+                elif entry.is_file():
+                    try:
+                        files.append((entry, entry.stat()))
+                    except OSError as e:
+                        print(f"Skipped {entry.path}: {e}")
+        return subdirs, files
+
+    def _scan_dir(self, directory, real_path, mtime, listing):
+        """Update the files and subdirectories of one directory from its listing and return the subdirectories."""
+        known = {row["path"]: row for row in
+                 self.connection.execute("SELECT * FROM files WHERE dir = ?", (directory,))}
+        subdir_names, files = listing
+        subdirs = {_key(path): name for name, path in subdir_names.items()}
+        seen_files = set()
+        group = os.path.basename(real_path)
+        for entry, stat in files:
+            path = _key(entry.path)
+            seen_files.add(path)
+            old = known.get(path)
+            if old is not None and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime:
+                continue
+            # the duration is probed later, by fill_durations
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, directory, entry.name, stat.st_size, stat.st_mtime,
+                 parse_prefix(entry.name), None, group))
+        for path in set(known) - seen_files:
+            self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        for path, _ in self._child_dirs(directory, real_path):
+            if path not in subdirs:
+                self._forget_dir(path)
+        for path, name in subdirs.items():
+            # new subdirectories get mtime -1 so that they are scanned right after
+            self.connection.execute("INSERT OR IGNORE INTO dirs VALUES (?, ?, ?, -1)", (path, directory, name))
+        self.connection.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                                (directory, _key(os.path.dirname(directory)), group, mtime))
+        return [(path, os.path.join(real_path, name)) for path, name in subdirs.items()]
+
+    def _forget_dir(self, directory):
+        """Remove a directory and everything below it."""
+        below = directory.rstrip(os.sep) + os.sep
+        # substr rather than LIKE: LIKE treats "_" as a wildcard and ignores the case
+        self.connection.execute("DELETE FROM files WHERE dir = ? OR substr(dir, 1, ?) = ?",
+                                (directory, len(below), below))
+        self.connection.execute("DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?",
+                                (directory, len(below), below))
+
+    def record_move(self, source, destination):
+        """Update the catalogue after a file or a directory was moved or renamed by a tool.
+
+        Args:
+            source (str): The old path.
+            destination (str): The new path.
+        """
+        # the names come from the path given by the tool, the keys are normcased
+        new_name, new_group = os.path.basename(str(destination)), os.path.basename(os.path.dirname(str(destination)))
+        source, destination = _key(source), _key(destination)
+        self._record_move(source, destination, new_name, new_group)
+        if not self._batch_depth:
+            self.connection.commit()
+
+    def _record_move(self, source, destination, new_name, new_group):
+        self.connection.execute(
+            "UPDATE files SET path = ?, dir = ?, name = ?, prefix = ?, grp = ? WHERE path = ?",
+            (destination, os.path.dirname(destination), new_name, parse_prefix(new_name), new_group, source))
+        if self.connection.execute("SELECT 1 FROM dirs WHERE path = ?", (source,)).fetchone() is None:
+            return
+        below = source + os.sep
+        rows = self.connection.execute("SELECT path FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?",
+                                       (source, len(below), below)).fetchall()
+        for row in rows:
+            new_path = destination + row["path"][len(source):]
+            self.connection.execute("UPDATE dirs SET path = ?, parent = ? WHERE path = ?",
+                                    (new_path, os.path.dirname(new_path), row["path"]))
+            self.connection.execute("UPDATE files SET path = ? || substr(path, ?), dir = ? WHERE dir = ?",
+                                    (new_path, len(row["path"]) + 1, new_path, row["path"]))
+        # only the moved directory itself changes of name, and so the group of its files
+        self.connection.execute("UPDATE dirs SET name = ? WHERE path = ?", (new_name, destination))
+        self.connection.execute("UPDATE files SET grp = ? WHERE dir = ?", (new_name, destination))
+
+    def entries(self, directory, suffixes=None):
+        """Return the catalogued files of a directory sorted by name.
+
+        Args:
+            directory (str): The directory.
+            suffixes (tuple): Keep only the files ending with one of these suffixes (case insensitive).
+
+        Returns:
+            list: sqlite3.Row objects with the columns path, dir, name, size, mtime, prefix, duration, grp.
+        """
+        rows = self.connection.execute("SELECT * FROM files WHERE dir = ? ORDER BY name", (_key(directory),))
+        if suffixes is None:
+            return rows.fetchall()
+        suffixes = tuple(suffix.lower() for suffix in suffixes)
+        return [row for row in rows if row["name"].lower().endswith(suffixes)]
+
+    def list_files(self, directory, suffixes=None):
+        """Return the paths of the catalogued files of a directory sorted by name (like ``iterdir`` + ``is_file``)."""
+        return [Path(directory, row["name"]) for row in self.entries(directory, suffixes)]
+
+    def list_dirs(self, directory):
+        """Return the paths of the catalogued subdirectories of a directory sorted by name."""
+        rows = self.connection.execute("SELECT name FROM dirs WHERE parent = ? ORDER BY name", (_key(directory),))
+        return [Path(directory, row["name"]) for row in rows]
+
+    def size_collisions(self, root, min_size=1):
+        """Return the catalogued files below ``root`` whose size is shared by another file.
+
+        Args:
+            root (str): The directory.
+            min_size (int): Ignore the files smaller than this size in bytes.
+
+        Returns:
+            dict: {size: [paths]}, the paths with their real case (the keys are lowercased on Windows).
+        """
+        # real path of each directory key, rebuilt from the real case names of the directories below root
+        real_dirs = {_key(root): os.path.abspath(str(root))}
+        root = _key(root)
+        below = root.rstrip(os.sep) + os.sep
+        rows = self.connection.execute(
+            "SELECT size, dir, name FROM files WHERE size >= ? AND (dir = ? OR substr(dir, 1, ?) = ?) AND size IN "
+            "(SELECT size FROM files WHERE size >= ? GROUP BY size HAVING COUNT(*) > 1) ORDER BY size",
+            (min_size, root, len(below), below, min_size))
+        collisions = {}
+        for row in rows:
+            collisions.setdefault(row["size"], []).append(os.path.join(self._real_dir(row["dir"], real_dirs),
+                                                                         row["name"]))
+        return {size: paths for size, paths in collisions.items() if len(paths) > 1}
+
+    def _real_dir(self, directory, real_dirs):
+        """Return the real path of a directory key below a directory of ``real_dirs`` ({key: real path})."""
+        if directory not in real_dirs:
+            row = self.connection.execute("SELECT parent, name FROM dirs WHERE path = ?", (directory,)).fetchone()
+            real_dirs[directory] = (directory if row is None
+                                    else os.path.join(self._real_dir(row["parent"], real_dirs), row["name"]))
+        return real_dirs[directory]
+
+    def fill_durations(self, root, workers=8):
+        """Read with ffprobe the duration of the catalogued media files below ``root`` that have none yet.
+
+        Args:
+            root (str): The directory.
+            workers (int): The number of ffprobe processes running at the same time.
+
+        Returns:
+            int: The number of durations found.
+        """
+        if not shutil.which("ffprobe"):
+            return 0
+        root = _key(root)
+        below = root.rstrip(os.sep) + os.sep
+        rows = self.connection.execute(
+            "SELECT path, name FROM files WHERE duration IS NULL AND (dir = ? OR substr(dir, 1, ?) = ?)",
+            (root, len(below), below))
+        # the keys are valid paths: normcase only changes the case, and Windows paths ignore it
+        paths = [row["path"] for row in rows if row["name"].lower().endswith(MEDIA_SUFFIXES)]
+        # each probe waits for its own process, so threads are enough to run them in parallel
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            durations = [(duration, path) for path, duration in zip(paths, pool.map(probe_duration, paths))
+                         if duration is not None]
+        with self.batch():
+            self.connection.executemany("UPDATE files SET duration = ? WHERE path = ?", durations)
+        return len(durations)
+
+    def duration(self, path):
+        """Return the catalogued duration of a media file in seconds, or None if unknown."""
+        row = self.connection.execute("SELECT duration FROM files WHERE path = ?", (_key(path),)).fetchone()
+        return None if row is None else row["duration"]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    # usage: python catalogue.py <library root> [--full]
+    with Catalogue() as catalogue:
+        library_root = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
+        count = catalogue.refresh(library_root, full="--full" in sys.argv)
+        total = catalogue.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+        print(f"Rescanned {count} directories below {library_root}: "
+              f"{total[0]} files, {total[1] / 1024 ** 3:.2f} GB in {catalogue.db_path}")
@@ -0,0 +1,235 @@
+"""Find the duplicated media files of a library and optionally replace the copies with hardlinks.
+
+Course folders pulled from different sources often hold the same video under different names.
+Reading the whole library to compare it would take hours, so the candidates are pruned in three steps:
+    1. files are bucketed by size: a file with a unique size has no duplicate,
+    2. in each bucket only the head and the tail blocks are hashed (through mmap),
+    3. only the files still colliding are fully hashed, on a thread pool (hashlib releases the GIL).
+
+Files that are already hardlinks of each other are counted once.
+
+Usage:
+    python dedup.py D:/online_learning --report duplicates.json
+    python dedup.py D:/online_learning --hardlink            # keep one copy of each group
+"""
+import os
+import sys
+import json
+import mmap
+import hashlib
+import argparse
+import concurrent.futures
+from collections import defaultdict
+from pathlib import Path
+
+from progress import Progress
+
+# size of the head and of the tail hashed in the partial hash
+BLOCK_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+def collect_files(root, min_size=1, catalogue=None):
+    """Return the files below ``root`` bucketed by size, keeping only the sizes shared by several files.
+
+    Args:
+        root (str): The directory to scan.
+        min_size (int): Ignore the files smaller than this size in bytes.
+        catalogue (Catalogue): When given, the sizes are read from the catalogue instead of the disk.
+
+    Returns:
+        dict: {size: [paths]}
+    """
+    # empty files cannot be mapped, and are all "duplicates" of each other anyway
+    min_size = max(min_size, 1)
+    if catalogue is not None:
+        catalogue.refresh(root)
+        return catalogue.size_collisions(root, min_size)
+    by_size = defaultdict(list)
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                continue
+            if size >= min_size:
+                by_size[size].append(path)
+    return {size: paths for size, paths in by_size.items() if len(paths) > 1}
+
+
+def unique_inodes(paths):
+    """Drop the paths that are hardlinks of a path already in the list."""
+    seen, unique = set(), []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            # e.g. deleted since the scan, or not readable: left out of the duplicates
+            print(f"Skipped {path}: {e}")
+            continue
+        if (stat.st_dev, stat.st_ino) not in seen:
+            seen.add((stat.st_dev, stat.st_ino))
+            unique.append(path)
+    return unique
+
+
+def partial_hash(path, size):
+    """Hash the size, the first and the last ``BLOCK_SIZE`` bytes of a file.
+
+    Args:
+        path (str): The path of the file.
+        size (int): The size of the file (must be > 0 to be mapped).
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        digest.update(mapped[:BLOCK_SIZE])
+        if size > BLOCK_SIZE:
+            digest.update(mapped[max(BLOCK_SIZE, size - BLOCK_SIZE):])
+    return digest.hexdigest()
+
+
+def full_hash(path, task=None):
+    """Hash the whole content of a file.
+
+    Args:
+        path (str): The path of the file.
+        task (progress.Task): Task advanced by the number of bytes read.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            if task is not None:
+                task.update(len(chunk))
+    return digest.hexdigest()
+
+
+def _regroup(candidates, key_function, workers):
+    """Split groups of paths by ``key_function(path)`` computed on a thread pool, keeping the collisions.
+
+    The paths whose key cannot be computed (unreadable, deleted or emptied files) are reported and left out.
+    """
+    def keyed(item):
+        try:
+            return item, key_function(*item)
+        except (OSError, ValueError) as e:
+            # ValueError: mmap of a file truncated to 0 bytes since the size scan
+            print(f"Skipped {item[0]}: {e}")
+            return item, None
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        keys = pool.map(keyed, [(path, size) for size, paths in candidates.items() for path in paths])
+        groups = defaultdict(list)
+        for (path, size), key in keys:
+            if key is not None:
+                groups[(size, key)].append(path)
+    return {key: paths for key, paths in groups.items() if len(paths) > 1}
+
+
+def find_duplicates(root, min_size=1, workers=8, catalogue=None, progress=None):
+    """Find the groups of files with the same content below ``root``.
+
+    Args:
+        root (str): The directory to scan.
+        min_size (int): Ignore the files smaller than this size in bytes.
+        workers (int): The number of hashing threads.
+        catalogue (Catalogue): When given, the file sizes are read from the catalogue.
+        progress (Progress): When given, the full hashing is reported as a task.
+
+    Returns:
+        list: One dict {"size", "hash", "paths"} per group of duplicates, biggest waste first.
+    """
+    by_size = {}
+    for size, paths in collect_files(root, min_size, catalogue).items():
+        paths = unique_inodes(sorted(paths))
+        if len(paths) > 1:
+            by_size[size] = paths
+
+    partial = _regroup(by_size, lambda path, size: partial_hash(path, size), workers)
+
+    # files not bigger than the two blocks were already hashed entirely
+    duplicates = {key: paths for key, paths in partial.items() if key[0] <= 2 * BLOCK_SIZE}
+    to_hash = defaultdict(list)
+    for (size, _), paths in partial.items():
+        if size > 2 * BLOCK_SIZE:
+            to_hash[size].extend(paths)
+    task = None
+    if progress is not None and to_hash:
+        task = progress.task(total=sum(size * len(paths) for size, paths in to_hash.items()), desc="Hashing")
+    duplicates.update(_regroup(to_hash, lambda path, size: full_hash(path, task), workers))
+    if task is not None:
+        task.close()
+
+    groups = [{"size": size, "hash": digest, "paths": paths} for (size, digest), paths in duplicates.items()]
+    groups.sort(key=lambda group: group["size"] * (len(group["paths"]) - 1), reverse=True)
+    return groups
+
+
+def hardlink_duplicates(groups, dry_run=False):
+    """Replace every copy of each group by a hardlink to its first path.
+
+    The link is created next to the copy then moved over it, so a copy is never lost if the link fails.
+
+    Args:
+        groups (list): The groups returned by ``find_duplicates``.
+        dry_run (bool): Only print what would be done.
+
+    Returns:
+        int: The number of bytes reclaimed.
+    """
+    reclaimed = 0
+    for group in groups:
+        keep, *copies = group["paths"]
+        for copy in copies:
+            print(f"{copy}\n ----> hardlink of {keep}")
+            if dry_run:
+                reclaimed += group["size"]
+                continue
+            temporary = f"{copy}.dedup-tmp"
+            try:
+                os.link(keep, temporary)
+                os.replace(temporary, copy)
+                reclaimed += group["size"]
+            except OSError as e:
+                # e.g. the copy is on another drive, or the filesystem has no hardlinks
+                print(f"Failed to hardlink {copy}: {e}")
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+    return reclaimed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicated files and optionally hardlink them.")
+    parser.add_argument("root", type=Path, help="the library to scan")
+    parser.add_argument("--report", type=Path, default=Path("duplicates.json"), help="where to write the report")
+    parser.add_argument("--min-size", type=int, default=1024 * 1024, help="ignore smaller files (bytes)")
+    parser.add_argument("--workers", type=int, default=8, help="number of hashing threads")
+    parser.add_argument("--catalogue", action="store_true", help="read the file sizes from the media catalogue")
+    parser.add_argument("--hardlink", action="store_true", help="replace the copies with hardlinks")
+    parser.add_argument("--dry-run", action="store_true", help="with --hardlink, only print what would be done")
+    args = parser.parse_args()
+
+    catalogue = None
+    if args.catalogue:
+        from catalogue import Catalogue
+        catalogue = Catalogue()
+    with Progress() as progress:
+        groups = find_duplicates(args.root, args.min_size, args.workers, catalogue, progress)
+    wasted = sum(group["size"] * (len(group["paths"]) - 1) for group in groups)
+    args.report.write_text(json.dumps({"root": str(args.root), "wasted_bytes": wasted, "groups": groups}, indent=2))
+    print(f"{len(groups)} groups of duplicates, {wasted / 1024 ** 3:.2f} GB wasted. Report: {args.report}")
+    if args.hardlink:
+        reclaimed = hardlink_duplicates(groups, args.dry_run)
+        print(f"{'Would reclaim' if args.dry_run else 'Reclaimed'} {reclaimed / 1024 ** 3:.2f} GB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,46 @@
+"""Clone a repository (e.g. from huggingface) by downloading each of its files with IDM.
+
+Run it as a script. Importing it has no side effect: it asks nothing, configures no logging and defers
+the heavy imports (requests, bs4, fuzzywuzzy, tqdm) to the functions using them, so that other scripts
+and short lived worker processes can import its functions cheaply.
+"""
 import sys
-import requests
-from bs4 import BeautifulSoup
 import subprocess
 import os
 from pathlib import Path
 import time
 import re
-from tqdm import tqdm
 import logging
-from fuzzywuzzy import fuzz
+from progress import Progress, ProgressLogHandler
 
-# Configure logging
+# Logging is configured by the command line entry point (see configure_logging)
 log_filename = 'script_download.log'
 log_format = '%(levelname)s - %(message)s'
 
-# Create a logger and set the log level
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-# Create a file handler to write logs to the log file
-file_handler = logging.FileHandler(log_filename, mode='w')  # Set mode to 'w' to overwrite the file
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(logging.Formatter(log_format))
-logger.addHandler(file_handler)
 
-# Create a stream handler to write logs to stdout
-stream_handler = logging.StreamHandler(sys.stdout)
-stream_handler.setLevel(logging.INFO)
-stream_handler.setFormatter(logging.Formatter(log_format))
-logger.addHandler(stream_handler)
+def configure_logging(log_file=log_filename):
+    """
+    Configures the logger of the script: everything to the log file (overwritten) and INFO to stdout.
+
+    Args:
+        log_file (str): The log file.
+    """
+    logger.setLevel(logging.INFO)
+
+    # Create a file handler to write logs to the log file
+    file_handler = logging.FileHandler(log_file, mode='w')  # Set mode to 'w' to overwrite the file
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(logging.Formatter(log_format))
+    logger.addHandler(file_handler)
+
+    # Create a stream handler to write logs to stdout (above the progress bar while downloading,
+    # as JSON lines like the progress when stdout is not a terminal)
+    stream_handler = ProgressLogHandler(sys.stdout)
+    stream_handler.setLevel(logging.INFO)
+    stream_handler.setFormatter(logging.Formatter(log_format))
+    logger.addHandler(stream_handler)
 
 def get_direct_download_links(repository_url, domain):
     """
@@ -40,6 +52,9 @@ def get_direct_download_links(repository_url, domain):
     Returns:
         list: A list of direct download links.
     """
+    # imported here to keep the import of this module cheap
+    import requests
+    from bs4 import BeautifulSoup
     try:
         # Send a GET request to the repository page
         response = requests.get(repository_url, timeout=100)
@@ -76,6 +91,9 @@ def download_with_idm(file_url, download_location, filename):
         download_location (str): The location to save the downloaded file.
         filename (str): The name of the downloaded file.
     """
+    # imported here to keep the import of this module cheap
+    from fuzzywuzzy import fuzz
+
     # Path to IDM executable
     idm_path = r"C:\Program Files (x86)\Internet Download Manager\IDMan.exe"
 
@@ -126,12 +144,10 @@ def download_with_idm(file_url, download_location, filename):
                 # continue to check if the download has finished
         # Display a progress bar for the download
         wait_interval = get_wait_interval(file_size)
-        old_size = 0
         dynamic_size_log_pattern = "time \d+, speed \d+, downl (\d+) Bytes"
-        # Temporarily remove the stream handler because the stream_handler disturb the progress bar
-        logger.removeHandler(stream_handler)
 
-        with tqdm(total=file_size, unit='B', unit_scale=True, desc=f"Downloading {filename}") as progress:
+        with Progress(stream=sys.stdout) as progress:
+            task = progress.task(total=file_size, desc=f"Downloading {filename}")
             while not os.path.exists(str(full_download_path)):
                 time.sleep(wait_interval)
                 # need to get the latest logs by re-reading the log file
@@ -142,17 +158,9 @@ def download_with_idm(file_url, download_location, filename):
                     logger.error(f"encountered an error while trying to get the downloaded size. Error: {str(e)}")
                     continue
                     # continue to check if the download has finished
-                downloaded_data_size = new_size - old_size
-                progress.update(downloaded_data_size)
-                # Refresh the progress bar
-                progress.refresh()
-                percent = (progress.n / progress.total) * 100
-
-                # Log the progress on the same line
-                logger.info(f"Progress: {progress.n}/{progress.total} ({percent:.2f}%)")
-                old_size = new_size
-    # Restore the stream handler
-    logger.addHandler(stream_handler)
+                # the task computes the percentage, the throughput and the ETA
+                task.set(new_size)
+            task.set(file_size)
     # need to stop 
     logger.info("Download completed.")
     logger.info(f"Downloaded file: {full_download_path}")
@@ -209,13 +217,22 @@ def find_latest_log_file(directory=None, duration=60):
         return latest_log_files
 
 
-def main():
+def main(use_default_values=None):
     """
     Main function to initiate the download process.
+
+    Args:
+        use_default_values (bool): Whether to use the default values instead of prompting the user.
+            The user is asked when it is None.
     """
-    
+    from extract_archives import ExtractionPipeline, is_archive
+
+    # Input condition to decide whether to always use default values or prompt the user for input
+    if use_default_values is None:
+        use_default_values = input("Do you want to always use default values? (Y/ENTER/N): ").upper() in ("Y", "")
+
     # Prompt the user for a repository link
-    repository_url = input("Enter the repository link: ") if not USE_DEFAULT_VALUES else DEFAULT_REPOSITORY_URL
+    repository_url = input("Enter the repository link: ") if not use_default_values else DEFAULT_REPOSITORY_URL
 
     url_patterns = (
         r"^https://(.*?)/(.*?)/tree/main$",
@@ -243,47 +260,74 @@ def main():
         logger.info(f"{i+1}. {link}")
 
     # Prompt the user for the download location
-    if USE_DEFAULT_VALUES:
+    if use_default_values:
         download_location = DEFAULT_DOWNLOAD_LOCATION
     else:
         download_location = input("Enter the download location (or press Enter for default): ") or os.getcwd()
-    # download_location = input("Enter the download location: ") if not USE_DEFAULT_VALUES else DEFAULT_DOWNLOAD_LOCATION
+    # download_location = input("Enter the download location: ") if not use_default_values else DEFAULT_DOWNLOAD_LOCATION
 
     # Join the current working directory and the repo name.
     download_location = Path(download_location) / repo_name
 
     # Confirm the download location with the user
     logger.info(f"Download location: {download_location}")
-    if not USE_DEFAULT_VALUES:
+    if not use_default_values:
         confirmation = input("Confirm the download location (Y/ENTER/N): ")
         if confirmation.upper() not in ("Y", ""):
             raise ValueError("Download location confirmation failed.")
     # Create the folder.
     download_location.mkdir(exist_ok=True)
 
-    for file_index, file_url in enumerate(download_links):
-        # Download the selected file using IDM
-        file_url = download_links[file_index]
-        filename = os.path.basename(file_url)
-        full_download_path = download_location / filename
-        try:
-            if os.path.exists(str(full_download_path)):
-                logger.info(f"File already downloaded: {full_download_path}")
-            else:
-                # download the file with IDM
-                download_with_idm(file_url, download_location, filename)
-        except Exception as e:
-            logger.error("An error occurred during the download.")
-            raise Exception(f"Download error: {str(e)}")
+    # Decide whether the zip/rar archives are extracted while the next files download
+    if use_default_values:
+        extract_archives, delete_archives = DEFAULT_EXTRACT_ARCHIVES, DEFAULT_DELETE_ARCHIVES
+    else:
+        # opt-in: the extracted folders take about as much disk space as the archives
+        extract_archives = input("Extract archives as soon as they are downloaded? (Y/N/ENTER): ").upper() == "Y"
+        delete_archives = extract_archives and input("Delete archives once extracted? (Y/N/ENTER): ").upper() == "Y"
+
+    with ExtractionPipeline(workers=EXTRACTION_WORKERS, delete_after=delete_archives, log=logger) as pipeline:
+        for file_index, file_url in enumerate(download_links):
+            # Download the selected file using IDM
+            file_url = download_links[file_index]
+            filename = os.path.basename(file_url)
+            full_download_path = download_location / filename
+            if delete_archives and is_archive(full_download_path) and full_download_path.with_suffix("").exists():
+                # the archive was extracted then deleted by a previous run: downloading it again is useless
+                logger.info(f"Archive already extracted: {full_download_path.with_suffix('')}")
+                continue
+            try:
+                if os.path.exists(str(full_download_path)):
+                    logger.info(f"File already downloaded: {full_download_path}")
+                else:
+                    # download the file with IDM
+                    download_with_idm(file_url, download_location, filename)
+            except Exception as e:
+                logger.error("An error occurred during the download.")
+                raise Exception(f"Download error: {str(e)}")
+            if extract_archives:
+                # extracted in the background while the next file downloads
+                pipeline.submit(full_download_path)
+        if extract_archives and pipeline.futures:
+            logger.info("Waiting for the archive extractions to finish.")
+        failures = pipeline.wait()
+    if failures:
+        raise Exception(f"Extraction error for {', '.join(str(path) for path in failures)}")
     logger.info(f"Clone of repo {repo_name} is done.")
 
-# Input condition to decide whether to always use default values or prompt the user for input
-USE_DEFAULT_VALUES = input("Do you want to always use default values? (Y/ENTER/N): ").upper() in ("Y", "")
-
 # Default values
 DEFAULT_REPOSITORY_URL = 'https://huggingface.co/facebook/dino-vitb16/tree/main'
 
 DEFAULT_DOWNLOAD_LOCATION = Path(os.getcwd())
 
+# Extract the downloaded .zip/.rar archives in the background while the next files download
+# (off by default: it roughly doubles the disk space used, unless the archives are deleted)
+DEFAULT_EXTRACT_ARCHIVES = False
+# Delete each archive once its extraction is verified
+DEFAULT_DELETE_ARCHIVES = False
+# Number of archives extracted at the same time
+EXTRACTION_WORKERS = 2
+
 if __name__ == "__main__":
+    configure_logging()
     main()
@@ -0,0 +1,174 @@
+"""Extract the downloaded archives on a worker pool while the next files are still downloading.
+
+``ExtractionPipeline.submit`` is called as soon as an archive is complete; the extraction runs in the
+background, so the time to a usable tree is about max(download, extraction) instead of their sum.
+
+Zip archives are extracted member by member with ``zipfile`` (bounded memory, CRC of every member
+checked), so a corrupted archive is detected before it is deleted. Rar archives need the optional
+``rarfile`` package, or a ``7z``/``unrar`` executable on the PATH.
+
+Example:
+    with ExtractionPipeline(workers=2, delete_after=True) as pipeline:
+        for url in links:
+            path = download(url)
+            pipeline.submit(path)
+"""
+import os
+import shutil
+import logging
+import zipfile
+import subprocess
+import concurrent.futures
+from pathlib import Path
+
+ARCHIVE_SUFFIXES = (".zip", ".rar")
+
+logger = logging.getLogger(__name__)
+
+
+def is_archive(path):
+    """Return True if the file is an archive that can be extracted."""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def extract_zip(archive_path, destination):
+    """Extract a zip archive member by member, checking the CRC of each member.
+
+    Args:
+        archive_path (Path): The path of the archive.
+        destination (Path): The folder to extract to.
+
+    Returns:
+        int: The number of extracted members.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        members = archive.infolist()
+        for member in members:
+            # extract streams the member to disk, sanitizes its path and raises BadZipFile on a wrong CRC
+            archive.extract(member, destination)
+    return len(members)
+
+
+def extract_rar(archive_path, destination):
+    """Extract a rar archive with ``rarfile`` when installed, otherwise with 7z or unrar.
+
+    Args:
+        archive_path (Path): The path of the archive.
+        destination (Path): The folder to extract to.
+
+    Returns:
+        int: The number of extracted members, or None when extracted by an external tool.
+    """
+    try:
+        import rarfile
+    except ImportError:
+        rarfile = None
+    if rarfile is not None:
+        with rarfile.RarFile(archive_path) as archive:
+            archive.testrar()
+            archive.extractall(destination)
+            return len(archive.infolist())
+    if shutil.which("7z"):
+        command = ["7z", "x", "-y", f"-o{destination}", str(archive_path)]
+    elif shutil.which("unrar"):
+        command = ["unrar", "x", "-y", str(archive_path), f"{destination}{os.sep}"]
+    else:
+        raise RuntimeError(f"Cannot extract {archive_path}: install the rarfile package, 7z or unrar")
+    destination.mkdir(parents=True, exist_ok=True)
+    # both tools verify the checksums and exit with a non zero code on error
+    subprocess.run(command, check=True, capture_output=True)
+    return None
+
+
+def extract_archive(archive_path, destination=None, delete_after=False, log=logger):
+    """Extract an archive and optionally delete it once the extraction succeeded.
+
+    Args:
+        archive_path (Path): The path of the archive.
+        destination (Path): The folder to extract to. Defaults to the archive path without its suffix.
+        delete_after (bool): Delete the archive after a successful (verified) extraction.
+        log (logging.Logger): The logger to report to.
+
+    Returns:
+        Path: The folder the archive was extracted to.
+    """
+    archive_path = Path(archive_path)
+    destination = Path(destination) if destination else archive_path.with_suffix("")
+    if destination.exists():
+        log.info(f"Archive already extracted: {destination}")
+        return destination
+    # extract next to the destination first, so that an interrupted extraction is not taken for a done one
+    partial = destination.with_name(destination.name + ".partial")
+    if partial.exists():
+        shutil.rmtree(partial)
+    log.info(f"Extracting {archive_path.name} ...")
+    try:
+        if archive_path.suffix.lower() == ".zip":
+            count = extract_zip(archive_path, partial)
+        else:
+            count = extract_rar(archive_path, partial)
+        partial.rename(destination)
+    except BaseException:
+        # a corrupted archive or an interruption should not leave a half extracted folder behind
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    log.info(f"Extracted {archive_path.name}{f' ({count} files)' if count is not None else ''} to {destination}")
+    if delete_after:
+        archive_path.unlink()
+        log.info(f"Deleted archive {archive_path}")
+    return destination
+
+
+class ExtractionPipeline:
+    """Pool of workers extracting archives in the background.
+
+    Args:
+        workers (int): The number of archives extracted at the same time.
+        delete_after (bool): Delete each archive after a successful extraction.
+        log (logging.Logger): The logger to report to.
+    """
+
+    def __init__(self, workers=2, delete_after=False, log=logger):
+        self.delete_after = delete_after
+        self.log = log
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="extract")
+        self.futures = {}
+        self.failures = {}
+
+    def submit(self, archive_path, destination=None):
+        """Queue an archive for extraction. Files that are not archives are ignored.
+
+        Args:
+            archive_path (Path): The path of the downloaded archive.
+            destination (Path): The folder to extract to. Defaults to the archive path without its suffix.
+
+        Returns:
+            concurrent.futures.Future: The future of the extraction, or None if the file is not an archive.
+        """
+        if not is_archive(archive_path):
+            return None
+        future = self.executor.submit(extract_archive, archive_path, destination, self.delete_after, self.log)
+        self.futures[Path(archive_path)] = future
+        return future
+
+    def wait(self):
+        """Wait for every queued extraction.
+
+        Returns:
+            dict: {archive path: exception} for the archives that could not be extracted.
+        """
+        while self.futures:
+            archive_path, future = self.futures.popitem()
+            try:
+                future.result()
+            except Exception as e:
+                self.log.error(f"Failed to extract {archive_path}: {e}")
+                self.failures[archive_path] = e
+        return self.failures
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wait()
+        self.executor.shutdown()
@@ -2,6 +2,8 @@ import json
 from pathlib import Path
 from fuzzywuzzy import fuzz
 import shutil
+from contextlib import nullcontext
+from catalogue import Catalogue
 
 def get_actual_file_name(file_name, actual_files):
     """
@@ -40,31 +42,48 @@ def create_subfolder(folder_path, subfolder_name):
     subfolder_path.mkdir(parents=True, exist_ok=True)
     return subfolder_path
 
-def process_files(folder_path, json_file_path):
+def process_files(folder_path, json_file_path, catalogue=None):
+    """
+    Move the files of a folder into the subfolders described by a JSON manifest.
+
+    Args:
+        folder_path (Path): Path to the folder holding the files.
+        json_file_path (Path): Path to the JSON manifest {subfolder_name: {key: file_name}}.
+        catalogue (Catalogue): When given, the files are listed from the catalogue instead of the disk,
+            and the moves are recorded in it.
+    """
     with open(json_file_path, 'r') as json_file:
         json_data = json.load(json_file)
 
-    actual_files = [f.name for f in folder_path.iterdir() if f.is_file()]
+    if catalogue is None:
+        actual_files = [f.name for f in folder_path.iterdir() if f.is_file()]
+    else:
+        catalogue.refresh(folder_path)
+        actual_files = [f.name for f in catalogue.list_files(folder_path)]
 
-    for subfolder_name, files_dict in json_data.items():
-        print("=" * 70)
-        subfolder_path = create_subfolder(folder_path, subfolder_name)
-        print(f"Created subfolder: {subfolder_name}")
+    # all the moves are recorded in one transaction
+    with catalogue.batch() if catalogue is not None else nullcontext():
+        for subfolder_name, files_dict in json_data.items():
+            print("=" * 70)
+            subfolder_path = create_subfolder(folder_path, subfolder_name)
+            print(f"Created subfolder: {subfolder_name}")
 
-        for file_name in files_dict.values():
-            actual_file_name = get_actual_file_name(file_name, actual_files)
-            source_file_path = folder_path / actual_file_name
+            for file_name in files_dict.values():
+                actual_file_name = get_actual_file_name(file_name, actual_files)
+                source_file_path = folder_path / actual_file_name
 
-            if not actual_file_name:
-                print(f"File not found: {file_name}")
-            else:
-                actual_file_name = actual_file_name.replace(" .mp4", ".mp4")
-                destination_file_path = subfolder_path / actual_file_name
-                print(f"{actual_file_name} represents {file_name}")
-                shutil.move(source_file_path, destination_file_path)
-                print(f"Moved {source_file_path} to {destination_file_path}")
+                if not actual_file_name:
+                    print(f"File not found: {file_name}")
+                else:
+                    actual_file_name = actual_file_name.replace(" .mp4", ".mp4")
+                    destination_file_path = subfolder_path / actual_file_name
+                    print(f"{actual_file_name} represents {file_name}")
+                    shutil.move(source_file_path, destination_file_path)
+                    if catalogue is not None:
+                        catalogue.record_move(source_file_path, destination_file_path)
+                    print(f"Moved {source_file_path} to {destination_file_path}")
 
 if __name__ == "__main__":
     folder_path = Path('D:/online_learning/linux')
     json_file_path = Path('D:/online_learning/Linux.json')
-    process_files(folder_path, json_file_path)
+    process_files(folder_path, json_file_path, Catalogue(probe_durations=False))
@@ -1,7 +1,6 @@
 import time
-import os
-import re
-from tqdm import tqdm
+import logging
+from progress import Progress, ProgressLogHandler
 
 # Define the file size in bytes
 file_size = 1000000000  # 1 GB
@@ -9,34 +8,25 @@ file_size = 1000000000  # 1 GB
 # Define the wait interval between updates (in seconds)
 wait_interval = 0.1
 
-# Define the dynamic size log pattern
-dynamic_size_log_pattern = r"Current Size: (\d+) bytes"
-
-# Simulated download loop
-with tqdm(total=file_size, unit='B', unit_scale=True, desc="Downloading", ncols=80) as progress:
-    old_size = 0
-    while old_size < file_size:
+# Log records go above the bars, no need to remove the handler while downloading
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(ProgressLogHandler())
+
+# Simulated downloads: two files in parallel lines, the display is refreshed at most every 0.5 s
+# (pass quiet=True, or pipe the output, to get JSON lines instead of bars)
+with Progress() as progress:
+    first = progress.task(total=file_size, desc="Downloading part 1")
+    second = progress.task(total=file_size // 2, desc="Downloading part 2")
+    while first.n < first.total or second.n < second.total:
         # Simulate some processing time
         time.sleep(wait_interval)
 
-        # Generate a random new size for demonstration purposes
-        new_size = old_size + int(1024 * 1024 * 10)  # Increase by 10 MB
-
-        # Calculate the downloaded data size
-        downloaded_data_size = new_size - old_size
-
-        # Update the progress bar with the downloaded data size
-        progress.update(downloaded_data_size)
-
-        # Refresh the progress bar
-        progress.refresh()
-
-        # Calculate the percentage manually
-        percent = (progress.n / progress.total) * 100
-
-        # Log the progress on the same line
-        # print(f"\rProgress: {progress.n}/{progress.total} ({percent:.2f}%)", end='')
+        # Increase by 10 MB and 5 MB, the throughput and the ETA are computed by the task
+        first.update(min(1024 * 1024 * 10, first.total - first.n))
+        second.update(min(1024 * 1024 * 5, second.total - second.n))
 
-        old_size = new_size
+        if first.n >= first.total // 2 > first.n - 1024 * 1024 * 10:
+            logger.info("part 1 is half way")
 
-print("\nDownload completed!")
+logger.info("Download completed!")
@@ -1,28 +1,49 @@
 import os
 from xml.etree.ElementTree import ElementTree, Element, SubElement
 
-def write_playlist(folder_path, playlist_file):
-    subfolders = [f for f in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, f))]
+def write_playlist(folder_path, playlist_file, catalogue=None):
+    """Write a VLC (xspf) playlist of the mp4 videos found in the subfolders of a folder.
+
+    Args:
+        folder_path (str): The folder holding one subfolder per chapter.
+        playlist_file (str): The path of the playlist to write.
+        catalogue (Catalogue): When given, the subfolders and videos are listed from the catalogue
+            instead of the disk, and the durations (probed with ffprobe once) are written in the playlist.
+    """
+    if catalogue is None:
+        subfolders = [f for f in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, f))]
+    else:
+        catalogue.refresh(folder_path)
+        # only the files without a duration yet are probed
+        catalogue.fill_durations(folder_path)
+        subfolders = [d.name for d in catalogue.list_dirs(folder_path)]
     subfolders.sort()
-    # Create a list of video files sorted by folder name and video name
+    # Create a list of (video file, duration) sorted by folder name and video name
     video_files = []
     for subfolder in subfolders:
         subfolder_path = os.path.join(folder_path, subfolder)
-        video_files_in_subfolder = [f for f in os.listdir(subfolder_path) if f.endswith(".mp4")]
+        if catalogue is None:
+            video_files_in_subfolder = [(f, None) for f in os.listdir(subfolder_path) if f.endswith(".mp4")]
+        else:
+            # the durations come with the listing: no query per track
+            video_files_in_subfolder = [(row["name"], row["duration"])
+                                        for row in catalogue.entries(subfolder_path, suffixes=(".mp4",))]
         video_files_in_subfolder.sort()
-        video_files.extend([os.path.join(subfolder, f) for f in video_files_in_subfolder])
+        video_files.extend([(os.path.join(subfolder, f), duration) for f, duration in video_files_in_subfolder])
 
     root = Element("playlist", xmlns="http://xspf.org/ns/0/", xmlns_vlc="http://www.videolan.org/vlc/playlist/ns/0/", version="1")
     SubElement(root, "title").text = "Liste de lecture"
     tracklist = SubElement(root, "trackList")
 
-    for i, filename in enumerate(video_files):
+    for i, (filename, duration) in enumerate(video_files):
         file_path = os.path.join(folder_path, filename)
-        if os.path.isfile(file_path):
+        # the catalogue only lists existing files
+        if catalogue is not None or os.path.isfile(file_path):
             track = SubElement(tracklist, "track")
             SubElement(track, "location").text = f"file:///{file_path}"
             SubElement(track, "title").text = os.path.splitext(os.path.basename(filename))[0]
-            SubElement(track, "duration").text = "0"
+            # xspf durations are in milliseconds
+            SubElement(track, "duration").text = str(int(duration * 1000)) if duration else "0"
             extension = SubElement(track, "extension", application="http://www.videolan.org/vlc/playlist/0")
             SubElement(extension, "vlc:id").text = str(i)
 
@@ -31,10 +52,25 @@ def write_playlist(folder_path, playlist_file):
         # root.write(f, encoding="utf-8", xml_declaration=True)
         ElementTree(root).write(f, encoding="utf-8", xml_declaration=True)
 
-# Example usage
-base_path = os.path.dirname(os.path.abspath(__file__))
-parent_folders = [os.path.join(base_path, d) for d in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, d))]
 
-for folder_path in parent_folders:
-    playlist_file = f"{folder_path}_playlist.xspf"
-    write_playlist(folder_path, playlist_file)
+def main(base_path=None):
+    """Write one playlist per course folder found next to this script.
+
+    Args:
+        base_path (str): The folder holding the courses. Defaults to the folder of this script.
+    """
+    # imported here: importing this module only to call write_playlist should not open the catalogue
+    from catalogue import Catalogue
+
+    base_path = base_path or os.path.dirname(os.path.abspath(__file__))
+    catalogue = Catalogue()
+    catalogue.refresh(base_path)
+    parent_folders = [str(d) for d in catalogue.list_dirs(base_path)]
+
+    for folder_path in parent_folders:
+        playlist_file = f"{folder_path}_playlist.xspf"
+        write_playlist(folder_path, playlist_file, catalogue)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Throughput aware progress reporting shared by the download and media scripts.
+
+Compared to calling ``tqdm.update`` + ``tqdm.refresh`` after every chunk:
+    * the terminal is redrawn at most once every ``min_interval`` seconds whatever the number of updates,
+    * the throughput and the ETA are computed over a moving time window instead of since the start,
+    * several tasks (nested or running in parallel threads) get their own line,
+    * ``ProgressLogHandler`` prints log records above the bars, so handlers never need to be removed,
+    * when the output is not a terminal (CI, cron, worker processes) the bars are replaced by
+      JSON lines that are easy to parse: {"task": ..., "n": ..., "total": ..., "rate": ..., "eta": ...},
+      and the messages and log records sharing the stream are JSON lines too: {"message": ..., "level": ...}
+
+Example:
+    with Progress() as progress:
+        task = progress.task(total=file_size, desc="Downloading")
+        for chunk in chunks:
+            task.update(len(chunk))
+"""
+import sys
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+# shared by every Progress and handed to tqdm once: the bars of all the Progress objects and the
+# ProgressLogHandler writes must be serialized by the same lock
+_output_lock = threading.RLock()
+_tqdm_lock_set = False
+
+# tqdm's own rate and remaining time are computed since the start of the bar: left out in favour of the
+# moving window throughput and ETA added as postfix
+BAR_FORMAT = "{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}{postfix}]"
+
+
+def _is_tty(stream):
+    """Return True if the stream is an interactive terminal."""
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def format_size(num, unit="B"):
+    """Format a number with a binary prefix (e.g. 1536 -> '1.50 KiB')."""
+    for prefix in ("", "Ki", "Mi", "Gi", "Ti"):
+        if abs(num) < 1024:
+            return f"{num:.2f} {prefix}{unit}"
+        num /= 1024
+    return f"{num:.2f} Pi{unit}"
+
+
+def format_eta(seconds):
+    """Format a duration in seconds as [H:]MM:SS, or '?' when unknown."""
+    if seconds is None:
+        return "?"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+class Task:
+    """One unit of work tracked by a ``Progress``. Created with ``Progress.task``.
+
+    ``update``/``set`` only touch counters; the display is refreshed when ``min_interval`` has elapsed
+    since the last refresh, so they are cheap enough to be called for every chunk.
+    ``update`` and ``set`` can be called from several threads (e.g. a pool hashing files).
+    """
+
+    def __init__(self, progress, total, desc, unit, position):
+        self.progress = progress
+        self.total = total
+        self.desc = desc
+        self.unit = unit
+        self.position = position
+        self.n = 0
+        self.start_time = time.monotonic()
+        self.closed = False
+        self._last_refresh = self.start_time
+        # protects n, the samples and the refresh time; always taken before the lock of the Progress
+        self._lock = threading.RLock()
+        # (timestamp, n) samples used for the moving window throughput
+        self._samples = deque([(self.start_time, 0)])
+        self._bar = progress._open_bar(self)
+
+    def update(self, increment=1):
+        """Add ``increment`` to the amount of work done. Ignored once the task is closed."""
+        with self._lock:
+            if not self.closed:
+                self._set_locked(self.n + increment)
+
+    def set(self, n):
+        """Set the absolute amount of work done (e.g. the size read from a downloader log). Ignored once closed."""
+        with self._lock:
+            if not self.closed:
+                self._set_locked(n)
+
+    def _set_locked(self, n):
+        self.n = n
+        now = time.monotonic()
+        if now - self._last_refresh >= self.progress.min_interval:
+            self._sample(now)
+            self.progress._draw(self)
+
+    @property
+    def percent(self):
+        """float: The completed percentage, or None when the total is unknown."""
+        return 100 * self.n / self.total if self.total else None
+
+    @property
+    def rate(self):
+        """float: The throughput over the last ``window`` seconds in units per second, or None."""
+        (first_time, first_n), (last_time, last_n) = self._samples[0], self._samples[-1]
+        if last_time <= first_time:
+            return None
+        return (last_n - first_n) / (last_time - first_time)
+
+    @property
+    def eta(self):
+        """float: The estimated remaining time in seconds, or None when it cannot be estimated."""
+        rate = self.rate
+        if not self.total or not rate:
+            return None
+        return max(self.total - self.n, 0) / rate
+
+    def refresh(self, now=None):
+        """Record a throughput sample and redraw the task. Ignored once the task is closed."""
+        with self._lock:
+            if self.closed:
+                return
+            self._sample(now or time.monotonic())
+            self.progress._draw(self)
+
+    def _sample(self, now):
+        self._last_refresh = now
+        self._samples.append((now, self.n))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.progress.window:
+            self._samples.popleft()
+
+    def close(self):
+        """Mark the task as finished and release its line."""
+        with self._lock:
+            if self.closed:
+                return
+            self._sample(time.monotonic())
+            self.closed = True
+            self.progress._close_task(self)
+
+    def snapshot(self):
+        """Return the state of the task as a JSON serializable dict."""
+        rate = self.rate
+        return {
+            "task": self.desc,
+            "n": self.n,
+            "total": self.total,
+            "percent": None if self.percent is None else round(self.percent, 2),
+            "rate": None if rate is None else round(rate, 2),
+            "eta": None if self.eta is None else round(self.eta, 1),
+            "elapsed": round(time.monotonic() - self.start_time, 1),
+            "unit": self.unit,
+            "done": self.closed,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Progress:
+    """Group of progress tasks sharing one output stream.
+
+    Args:
+        quiet (bool): Emit JSON lines instead of bars. Defaults to True when ``stream`` is not a terminal.
+        min_interval (float): Minimum number of seconds between two refreshes of a task.
+            Defaults to 0.5 s with bars and 5 s in quiet mode.
+        window (float): Length in seconds of the moving window used for the throughput and the ETA.
+        stream (file): Where to write the progress. Defaults to sys.stderr.
+    """
+
+    def __init__(self, quiet=None, min_interval=None, window=10.0, stream=None):
+        self.stream = stream or sys.stderr
+        self.quiet = not _is_tty(self.stream) if quiet is None else quiet
+        self.min_interval = min_interval if min_interval is not None else (5.0 if self.quiet else 0.5)
+        self.window = window
+        self.tasks = []
+        self._lock = _output_lock
+        self._positions = set()
+        if not self.quiet:
+            # imported here so that quiet runs do not pay for tqdm
+            from tqdm import tqdm
+            self._tqdm = tqdm
+            global _tqdm_lock_set
+            with _output_lock:
+                if not _tqdm_lock_set:
+                    # the same lock protects the bars of every thread and of every Progress
+                    tqdm.set_lock(_output_lock)
+                    _tqdm_lock_set = True
+
+    def task(self, total=None, desc="", unit="B"):
+        """Start tracking a new task.
+
+        Args:
+            total (int): The total amount of work, None if unknown.
+            desc (str): The description shown in front of the bar.
+            unit (str): The unit of the work. Bytes are shown with binary prefixes.
+
+        Returns:
+            Task: The new task. Nested or parallel tasks are shown on separate lines.
+        """
+        with self._lock:
+            position = 0
+            while position in self._positions:
+                position += 1
+            self._positions.add(position)
+            task = Task(self, total, desc, unit, position)
+            self.tasks.append(task)
+        return task
+
+    def write(self, message):
+        """Print a message above the bars without breaking them."""
+        with self._lock:
+            if self.quiet:
+                # a plain line would break the parsing of the JSON lines
+                self.stream.write(json.dumps({"message": message}) + "\n")
+                self.stream.flush()
+            else:
+                self._tqdm.write(message, file=self.stream)
+
+    def close(self):
+        """Close every task that is still open."""
+        for task in list(self.tasks):
+            task.close()
+
+    def _open_bar(self, task):
+        if self.quiet:
+            return None
+        return self._tqdm(total=task.total, desc=task.desc, unit=task.unit, unit_scale=task.unit == "B",
+                          unit_divisor=1024, position=task.position, leave=task.position == 0,
+                          file=self.stream, mininterval=self.min_interval, dynamic_ncols=True,
+                          bar_format=BAR_FORMAT)
+
+    def _draw(self, task):
+        with self._lock:
+            if self.quiet:
+                self.stream.write(json.dumps(task.snapshot()) + "\n")
+                self.stream.flush()
+                return
+            bar = task._bar
+            bar.n = task.n
+            rate = task.rate
+            if rate is not None:
+                speed = format_size(rate, task.unit) if task.unit == "B" else f"{rate:.2f} {task.unit}"
+                bar.set_postfix_str(f"{speed}/s, eta {format_eta(task.eta)}", refresh=False)
+            bar.refresh()
+
+    def _close_task(self, task):
+        with self._lock:
+            if self.quiet:
+                self.stream.write(json.dumps(task.snapshot()) + "\n")
+                self.stream.flush()
+            else:
+                task._bar.n = task.n
+                task._bar.close()
+            self._positions.discard(task.position)
+            self.tasks.remove(task)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ProgressLogHandler(logging.StreamHandler):
+    """Stream handler printing the log records above the progress bars instead of through them.
+
+    Use it in place of ``logging.StreamHandler``. When the stream is not a terminal, the records are
+    written as JSON lines {"message", "level", "logger"} so that they can be parsed with the progress lines.
+
+    Args:
+        stream (file): Where to write the records. Defaults to sys.stderr.
+        quiet (bool): Write JSON lines. Defaults to True when ``stream`` is not a terminal, like ``Progress``.
+    """
+
+    def __init__(self, stream=None, quiet=None):
+        super().__init__(stream)
+        self.quiet = quiet
+
+    def emit(self, record):
+        try:
+            message = self.format(record)
+            quiet = not _is_tty(self.stream) if self.quiet is None else self.quiet
+            if quiet:
+                message = json.dumps({"message": message, "level": record.levelname, "logger": record.name})
+            if not quiet and "tqdm" in sys.modules:
+                sys.modules["tqdm"].tqdm.write(message, file=self.stream)
+            else:
+                self.stream.write(message + self.terminator)
+                self.flush()
+        except Exception:
+            self.handleError(record)
@@ -3,6 +3,7 @@ import pandas as pd
 import altair as alt
 import numpy as np
 from datetime import datetime
+import instrumentation as inst
 
 ONLINE_CSV = 'https://raw.githubusercontent.com/dataprofessor/data/master/penguins_cleaned.csv'
 def main():
@@ -61,11 +62,13 @@ def main():
     st.write(f'from the radio options You selected **{selected_color}** color')
 
     st.subheader("line_chart")
-    df = create_dataframe()
+    with inst.section("data load"):
+        df = create_dataframe()
     st.write("Here's a DataFrame with funny data:")
     st.write(df)
     # display_line_chart(df)
-    st.line_chart(df)
+    with inst.section("chart build"):
+        st.line_chart(df)
     st.write("""
     The line chart above represents my daily journey:\n
     In the morning, my productivity is just average. Not a morning person!\n
@@ -139,6 +142,7 @@ def display_dataframe_example():
     st.write(df)
 
 
+@inst.timed(name="chart build")
 def display_plot_example():
     df = pd.DataFrame(np.random.randn(200, 4),
                       columns=['x', 'y', 'size', 'worth'])
@@ -170,6 +174,7 @@ def display_plot_example():
     st.altair_chart(filtered_chart)
 
 
+@inst.cached
 def create_dataframe():
     data = {
         'Time': ['Morning', 'Afternoon', 'Evening'],
@@ -195,6 +200,8 @@ if __name__ == "__main__":
     st.set_page_config(page_title="Custom Theme Example",
                        page_icon="🎨",
                        layout="wide")
+    # no-op unless STREAMLIT_INSTRUMENT=1
+    inst.start_rerun("app")
 
     main()
 
@@ -204,9 +211,10 @@ if __name__ == "__main__":
 
     my_bar = st.progress(0)
 
-    for percent_complete in range(100):
-        time.sleep(0.1)
-        my_bar.progress(percent_complete + 1)
+    with inst.section("progress demo"):
+        for percent_complete in range(100):
+            time.sleep(0.1)
+            my_bar.progress(percent_complete + 1)
 
     st.balloons()
 
@@ -242,11 +250,14 @@ if __name__ == "__main__":
             # Process the uploaded file
             st.success(f"File uploaded successfully! len={len(file_bytes)}")
             uploaded_file.seek(0)
-            df = pd.read_csv(uploaded_file)
+            with inst.section("csv load"):
+                df = pd.read_csv(uploaded_file)
             st.subheader('DataFrame')
             st.write(df)
             st.subheader('Descriptive Statistics')
-            st.write(df.describe())
+            with inst.section("describe"):
+                st.write(df.describe())
     else:
         st.info('☝️ Upload a CSV file')
-  
\ No newline at end of file
+
+    inst.finish_rerun()
@@ -2,12 +2,23 @@ import streamlit as st
 import pandas as pd
 from streamlit_pandas_profiling import st_profile_report
 from pandas_profiling import ProfileReport
+import instrumentation as inst
+
+# no-op unless STREAMLIT_INSTRUMENT=1
+inst.start_rerun("extended_app")
 
 st.header('`streamlit_pandas_profiling`')
 
-df = pd.read_csv(
-    'https://raw.githubusercontent.com/dataprofessor/data/master/penguins_cleaned.csv'
-)
+
+@inst.cached(name="penguins csv")
+def load_data(url):
+    return pd.read_csv(url)
+
+
+with inst.section("data load"):
+    df = load_data(
+        'https://raw.githubusercontent.com/dataprofessor/data/master/penguins_cleaned.csv'
+    )
 
 # Configure the report options
 config = {
@@ -21,7 +32,10 @@ config = {
 }
 
 # Generate the report with custom options
-report = ProfileReport(df, **config)
+with inst.section("profile report"):
+    report = ProfileReport(df, **config)
+    st_profile_report(report)
+with inst.section("report export"):
+    report.to_file("report.html")
 
-st_profile_report(report)
-report.to_file("report.html")
+inst.finish_rerun()
@@ -0,0 +1,225 @@
+"""Opt-in rerun instrumentation for the streamlit apps.
+
+Set the environment variable ``STREAMLIT_INSTRUMENT=1`` before ``streamlit run`` to enable it.
+Every rerun then gets:
+    * the wall time of each instrumented section/function,
+    * the hit/miss counts of the caches created with ``cached``,
+    * the peak resident memory of the process so far (``resource.getrusage``, not available on Windows),
+shown in a sidebar panel and appended as one JSON line to ``STREAMLIT_INSTRUMENT_LOG``
+(default: ``rerun_metrics.jsonl`` in the working directory).
+
+Set ``STREAMLIT_INSTRUMENT_MEMORY=1`` as well to trace the python allocations with tracemalloc instead,
+and get the peak and the growth of the memory of each rerun. Tracing every allocation slows the app
+down noticeably, so the timings of such runs should not be compared with the others.
+
+When the variable is not set, ``section`` and ``timed`` do nothing and ``cached`` is a plain ``st.cache_data``.
+
+Example:
+    import instrumentation as inst
+
+    inst.start_rerun()
+    with inst.section("data load"):
+        df = load_data()
+    inst.finish_rerun()
+"""
+import os
+import sys
+import json
+import time
+import threading
+import functools
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+ENABLED = os.environ.get("STREAMLIT_INSTRUMENT", "").lower() in ("1", "true", "yes")
+LOG_FILE = os.environ.get("STREAMLIT_INSTRUMENT_LOG", "rerun_metrics.jsonl")
+TRACE_MEMORY = os.environ.get("STREAMLIT_INSTRUMENT_MEMORY", "").lower() in ("1", "true", "yes")
+
+# key of the current rerun record in st.session_state
+_STATE_KEY = "_instrumentation_rerun"
+
+# cache statistics are process wide, like the caches themselves
+_cache_stats = {}
+_cache_stats_lock = threading.Lock()
+# set by the cached function body when it really runs, i.e. on a cache miss
+_local = threading.local()
+
+
+def _current_rerun():
+    """Return the record of the running rerun, or None when instrumentation is off or not started."""
+    if not ENABLED:
+        return None
+    return st.session_state.get(_STATE_KEY)
+
+
+def _peak_rss_mb():
+    """Return the peak resident memory of the process in MB, or None when unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 3)
+
+
+def start_rerun(app_name="streamlit_app"):
+    """Start recording a new rerun. Call it at the very top of the script.
+
+    Args:
+        app_name (str): Name written in the log records.
+    """
+    if not ENABLED:
+        return
+    if TRACE_MEMORY:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # tracemalloc is process wide: with several sessions rerunning at the same time the peak is shared.
+        tracemalloc.reset_peak()
+    st.session_state[_STATE_KEY] = {
+        "app": app_name,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "start": time.perf_counter(),
+        "memory_start": tracemalloc.get_traced_memory()[0] if TRACE_MEMORY else None,
+        "sections": {},
+        "cache": {},
+    }
+
+
+@contextmanager
+def section(name):
+    """Time the enclosed block and add it to the current rerun under ``name``.
+
+    Args:
+        name (str): The name of the section (e.g. "data load", "chart build").
+    """
+    record = _current_rerun()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        # a section entered several times in the same rerun is accumulated
+        record["sections"][name] = record["sections"].get(name, 0.0) + elapsed
+
+
+def timed(func=None, *, name=None):
+    """Decorator timing every call of a function as a section of the current rerun.
+
+    Args:
+        func (callable): The decorated function.
+        name (str): The section name. Defaults to the function name.
+    """
+    if func is None:
+        return functools.partial(timed, name=name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with section(name or func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def cached(func=None, *, name=None, **cache_kwargs):
+    """Drop-in replacement of ``st.cache_data`` that counts cache hits and misses.
+
+    A call is a miss when the function body runs, otherwise it was served from the cache.
+
+    Args:
+        func (callable): The decorated function.
+        name (str): The name of the cache in the reports. Defaults to the function name.
+        **cache_kwargs: Forwarded to ``st.cache_data`` (ttl, max_entries, ...).
+    """
+    if func is None:
+        return functools.partial(cached, name=name, **cache_kwargs)
+    if not ENABLED:
+        return st.cache_data(func, **cache_kwargs)
+
+    cache_name = name or func.__name__
+
+    @functools.wraps(func)
+    def body(*args, **kwargs):
+        _local.missed = True
+        return func(*args, **kwargs)
+    cached_body = st.cache_data(body, **cache_kwargs)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _local.missed = False
+        with section(f"cache:{cache_name}"):
+            result = cached_body(*args, **kwargs)
+        outcome = "misses" if _local.missed else "hits"
+        with _cache_stats_lock:
+            stats = _cache_stats.setdefault(cache_name, {"hits": 0, "misses": 0})
+            stats[outcome] += 1
+        record = _current_rerun()
+        if record is not None:
+            rerun_stats = record["cache"].setdefault(cache_name, {"hits": 0, "misses": 0})
+            rerun_stats[outcome] += 1
+        return result
+    wrapper.clear = cached_body.clear
+    return wrapper
+
+
+def finish_rerun():
+    """Close the current rerun: render the sidebar panel and append the record to the log file.
+
+    Returns:
+        dict: The record written to the log, or None when instrumentation is off.
+    """
+    record = _current_rerun()
+    if record is None:
+        return None
+    with _cache_stats_lock:
+        cache_totals = {name: dict(stats) for name, stats in _cache_stats.items()}
+    line = {
+        "app": record["app"],
+        "started_at": record["started_at"],
+        "total_s": round(time.perf_counter() - record["start"], 6),
+        "sections_s": {name: round(elapsed, 6) for name, elapsed in record["sections"].items()},
+        "cache_rerun": record["cache"],
+        "cache_total": cache_totals,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if TRACE_MEMORY:
+        current, peak = tracemalloc.get_traced_memory()
+        line["peak_memory_mb"] = round(peak / 1024 ** 2, 3)
+        line["memory_growth_mb"] = round((current - record["memory_start"]) / 1024 ** 2, 3)
+    _render_panel(line)
+    with open(LOG_FILE, "a", encoding="utf-8") as log_file:
+        log_file.write(json.dumps(line) + "\n")
+    del st.session_state[_STATE_KEY]
+    return line
+
+
+def _render_panel(line):
+    """Show the metrics of a rerun in the sidebar."""
+    with st.sidebar.expander("Rerun instrumentation", expanded=True):
+        st.metric("Rerun time", f"{line['total_s'] * 1000:.1f} ms")
+        if "peak_memory_mb" in line:
+            st.metric("Peak memory (rerun)", f"{line['peak_memory_mb']:.2f} MB")
+        if line["peak_rss_mb"] is not None:
+            st.metric("Peak RSS (process)", f"{line['peak_rss_mb']:.2f} MB")
+        if line["sections_s"]:
+            st.write("**Sections (ms)**")
+            sections = sorted(line["sections_s"].items(), key=lambda item: item[1], reverse=True)
+            st.table({"section": [name for name, _ in sections],
+                      "ms": [f"{elapsed * 1000:.1f}" for _, elapsed in sections]})
+        if line["cache_total"]:
+            st.write("**Cache hit rate**")
+            for name, stats in line["cache_total"].items():
+                calls = stats["hits"] + stats["misses"]
+                rate = stats["hits"] / calls if calls else 0.0
+                cold = " (cold this rerun)" if line["cache_rerun"].get(name, {}).get("misses") else ""
+                st.write(f"`{name}`: {rate:.0%} of {calls} calls{cold}")
+        st.caption(f"appended to {LOG_FILE}")